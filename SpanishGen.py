@@ -2,10 +2,28 @@
 # -*- coding:utf-8 -*-
 
 import random
-import re
-from typing import List, Dict, Set, Tuple
+from typing import Callable, List, Dict, Optional, Set, Tuple
 from dataclasses import dataclass, field
-from collections import defaultdict
+from functools import lru_cache
+
+# 音韻系統專用的亂數產生器，不與其他使用 random 模組的程式共用狀態
+_RNG = random.Random()
+
+def seed(n=None):
+    """設定詞語生成的亂數種子，讓生成結果可重現"""
+    _RNG.seed(n)
+
+# 音韻合法性檢查用的常數
+ALLOWED_CLUSTERS = (
+    'pl', 'pr', 'bl', 'br', 'fl', 'fr',
+    'cl', 'cr', 'gl', 'gr',
+    'tr', 'dr'
+)
+ALLOWED_FINAL_CONSONANTS = frozenset({'n', 's', 'r', 'l', 'd', 'z'})
+VOWEL_SET = frozenset('aeiou')
+_FINAL_OK_OR_VOWEL = VOWEL_SET | ALLOWED_FINAL_CONSONANTS
+# 抽樣用 ALLOWED_CLUSTERS（tuple），成員檢查用 frozenset
+_ALLOWED_CLUSTER_SET = frozenset(ALLOWED_CLUSTERS)
 
 @dataclass
 class PhonologySystem:
@@ -20,76 +38,98 @@ class PhonologySystem:
     'CCV'  
 ])
     phonotactic_rules: List[str] = field(default_factory=list)
-    
+    _vowels_tuple: tuple = field(default=(), init=False, repr=False, compare=False)
+    _consonants_tuple: tuple = field(default=(), init=False, repr=False, compare=False)
+    _word_generator: Optional[Callable[[int], str]] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._refresh_cache()
 
+    def _refresh_cache(self):
+        """子音／母音集合變動後，重建供隨機抽樣用的 tuple"""
+        self._vowels_tuple = tuple(sorted(self.vowels))
+        self._consonants_tuple = tuple(sorted(self.consonants))
+        self._word_generator = None
 
     def generate_syllable(self) -> str:
-        ALLOWED_CLUSTERS = [
-        'pl', 'pr', 'bl', 'br', 'fl', 'fr', 
-        'cl', 'cr', 'gl', 'gr', 
-        'tr', 'dr'
-        ]
-        pattern = random.choice(self.syllable_patterns)
+        choice = _RNG.choice
+        pattern = choice(self.syllable_patterns)
         syllable = ""
         
         if pattern == 'CCV':
-            cluster = random.choice(ALLOWED_CLUSTERS)
-            vowel = random.choice(list(self.vowels))
+            cluster = choice(ALLOWED_CLUSTERS)
+            vowel = choice(self._vowels_tuple)
             syllable = cluster + vowel
 
         else:
             for char in pattern:
                 if char == 'C':
-                    syllable += random.choice(list(self.consonants))
+                    syllable += choice(self._consonants_tuple)
                 elif char == 'V':
-                    syllable += random.choice(list(self.vowels))
+                    syllable += choice(self._vowels_tuple)
 
         return syllable
 
+    def _compile_generator(self) -> Callable[[int], str]:
+        """把目前的音素表綁進閉包，產生專用的詞語生成函式"""
+        consonants_tuple = self._consonants_tuple
+        vowels_tuple = self._vowels_tuple
+        patterns_tuple = tuple(self.syllable_patterns)
+        choice = _RNG.choice
+
+        def gen(syllable_count: int) -> str:
+            while True:
+                # === 1️⃣ 生成基本音節（與 generate_syllable 相同，但只用區域變數） ===
+                word = ""
+                for _ in range(syllable_count):
+                    pattern = choice(patterns_tuple)
+                    if pattern == 'CCV':
+                        word += choice(ALLOWED_CLUSTERS) + choice(vowels_tuple)
+                        continue
+                    for char in pattern:
+                        if char == 'C':
+                            word += choice(consonants_tuple)
+                        elif char == 'V':
+                            word += choice(vowels_tuple)
+
+                # 🚫 開頭不能是 "rr"
+                if word.startswith("rr"):
+                    continue
+
+                # === 2️⃣ 避免非法詞尾（O(1)，先於完整掃描） ===
+                if word and word[-1] not in _FINAL_OK_OR_VOWEL:
+                    continue
+
+                # === 3️⃣ 單次掃描：非法子音群、三連以上母音（遇到第一個違規即放棄） ===
+                vrun = crun = 0
+                prev = ''
+                for c in word:
+                    if c in VOWEL_SET:
+                        vrun += 1
+                        crun = 0
+                        if vrun >= 3:
+                            break
+                    else:
+                        crun += 1
+                        vrun = 0
+                        # 與 findall 相同，子音連串中每兩個為一組檢查
+                        if crun % 2 == 0 and prev + c not in _ALLOWED_CLUSTER_SET:
+                            break
+                    prev = c
+                else:
+                    # 若都合法 → 返回詞語
+                    return word
+
+        return gen
+
     def generate_word(self, syllable_count: int = None) -> str:
         """生成詞語，並檢查音韻合法性（避免非法 cluster、過長母音、非法詞尾）"""
-        ALLOWED_CLUSTERS = [
-            'pl', 'pr', 'bl', 'br', 'fl', 'fr',
-            'cl', 'cr', 'gl', 'gr',
-            'tr', 'dr'
-        ]
-        ALLOWED_FINAL_CONSONANTS = {'n', 's', 'r', 'l', 'd', 'z'}
-
         if syllable_count is None:
-            syllable_count = random.randint(1, 3)
+            syllable_count = _RNG.randint(1, 3)
 
-        while True:
-            # === 1️⃣ 生成基本音節 ===
-            word = ""
-            for _ in range(syllable_count):
-                word += self.generate_syllable()
-
-            # 🚫 開頭不能是 "rr"
-            if word.startswith("rr"):
-                continue
-
-            regenerate = False
-
-            # === 2️⃣ 避免非法子音群 ===
-            clusters = re.findall(r'[^aeiou]{2}', word)
-            for c in clusters:
-                if c not in ALLOWED_CLUSTERS:
-                    regenerate = True
-                    break
-
-            # === 3️⃣ 避免三連以上母音 ===
-            if re.search(r'[aeiou]{3,}', word):
-                regenerate = True
-
-            # === 4️⃣ 避免非法詞尾 ===
-            if re.search(r'[^aeiou]$', word):  # 以子音結尾
-                last = word[-1]
-                if last not in ALLOWED_FINAL_CONSONANTS:
-                    regenerate = True
-
-            # 若都合法 → 返回詞語
-            if not regenerate:
-                return word
+        if self._word_generator is None:
+            self._word_generator = self._compile_generator()
+        return self._word_generator(syllable_count)
 
 @dataclass
 class MorphologyRule:
@@ -100,6 +140,25 @@ class MorphologyRule:
     meaning: str
     position: str = ""
 
+@lru_cache(maxsize=None)
+def _pluralize(word: str) -> str:
+    """根據西班牙語拼寫規則產生複數形（結果快取，重複詞語不需再判斷）"""
+    if not word:
+        return word
+
+    last = word[-1]
+
+    # 1️⃣ 母音結尾 → +s
+    if last in ['a', 'e', 'i', 'o', 'u']:
+        return word + 's'
+
+    # 2️⃣ 以 z 結尾 → z → c + es
+    if last == 'z':
+        return word[:-1] + 'ces'
+
+    # 3️⃣ 其他子音結尾 → +es
+    return word + 'es'
+
 @dataclass
 class MorphologySystem:
     """構詞系統"""
@@ -107,44 +166,34 @@ class MorphologySystem:
     word_classes: Dict[str, List[str]] = field(default_factory=lambda: {
         'noun': [], 'verb': [], 'adjective': [], 'adverb': []
     })
+    _rules_by_name: Dict[str, MorphologyRule] = field(default_factory=dict, init=False, repr=False)
 
     def add_rule(self, name: str, rule_type: str, marker: str, meaning: str):
         """添加構詞規則"""
         rule = MorphologyRule(name, rule_type, marker, meaning)
         self.rules.append(rule)
+        # 同名規則以先加入者為準
+        self._rules_by_name.setdefault(name, rule)
 
     def apply_morphology(self, base_word: str, rule_name: str) -> str:
         """應用構詞規則"""
-        for rule in self.rules:
-            if rule.name == rule_name:
+        rule = self._rules_by_name.get(rule_name)
+        if rule is None:
+            return base_word
         # ✅ 特別處理複數
-                if rule_name == "plural":
-                    return self._apply_plural_rule(base_word)
-                if rule.rule_type == 'prefix':
-                    return rule.marker + base_word
-                elif rule.rule_type == 'suffix':
-                    return base_word + rule.marker
-                elif rule.rule_type == 'reduplication':
-                    return base_word + base_word
+        if rule_name == "plural":
+            return self._apply_plural_rule(base_word)
+        if rule.rule_type == 'prefix':
+            return rule.marker + base_word
+        elif rule.rule_type == 'suffix':
+            return base_word + rule.marker
+        elif rule.rule_type == 'reduplication':
+            return base_word + base_word
         return base_word
     
     def _apply_plural_rule(self, word: str) -> str:
         """根據西班牙語拼寫規則產生複數形"""
-        if not word:
-            return word
-
-        last = word[-1]
-
-        # 1️⃣ 母音結尾 → +s
-        if last in ['a', 'e', 'i', 'o', 'u']:
-            return word + 's'
-
-        # 2️⃣ 以 z 結尾 → z → c + es
-        if last == 'z':
-            return word[:-1] + 'ces'
-
-        # 3️⃣ 其他子音結尾 → +es
-        return word + 'es'
+        return _pluralize(word)
 
 @dataclass
 class SyntaxRule:
@@ -186,9 +235,24 @@ class LanguageCreatorGame:
         self.phonology = PhonologySystem()
         self.morphology = MorphologySystem()
         self.syntax = SyntaxSystem()
-        self.vocabulary = defaultdict(list)  # {詞性: [詞語列表]}
+        # 各詞類各自一個詞語列表
+        self.nouns: List[str] = []
+        self.verbs: List[str] = []
+        self.adjectives: List[str] = []
+        self.adverbs: List[str] = []
+        self.unknown: List[str] = []
         self.current_level = 1
 
+    @property
+    def vocabulary(self) -> Dict[str, List[str]]:
+        """以 {詞性: [詞語列表]} 檢視所有詞彙"""
+        return {
+            'unknown': self.unknown,
+            'noun': self.nouns,
+            'verb': self.verbs,
+            'adjective': self.adjectives,
+            'adverb': self.adverbs,
+        }
 
     def display_welcome(self):
         """顯示歡迎訊息"""
@@ -216,11 +280,13 @@ class LanguageCreatorGame:
                 new_consonant = input("請輸入要添加的子音：")
                 if new_consonant and len(new_consonant) <= 2:
                     self.phonology.consonants.add(new_consonant)
+                    self.phonology._refresh_cache()
                     print(f"已添加子音：{new_consonant}")
             elif choice == 'b':
                 remove_consonant = input("請輸入要移除的子音：")
                 if remove_consonant in self.phonology.consonants:
                     self.phonology.consonants.remove(remove_consonant)
+                    self.phonology._refresh_cache()
                     print(f"已移除子音：{remove_consonant}")
             elif choice == 'c':
                 break
@@ -235,12 +301,14 @@ class LanguageCreatorGame:
                 new_vowel = input("請輸入要添加的母音：")
                 if new_vowel and len(new_vowel) <= 3:
                     self.phonology.vowels.add(new_vowel)
+                    self.phonology._refresh_cache()
                     print(f"已添加母音：{new_vowel}")
 
             elif choice == 'b':
                 remove_vowel = input("請輸入要移除的母音：")
                 if remove_vowel in self.phonology.vowels:
                     self.phonology.vowels.remove(remove_vowel)
+                    self.phonology._refresh_cache()
                     print(f"已移除母音：{remove_vowel}")
             elif choice == 'c':
                 break
@@ -254,7 +322,7 @@ class LanguageCreatorGame:
         for i in range(15):
             word = self.phonology.generate_word()
             print(f"{i+1}. {word}")
-            self.vocabulary['unknown'].append(word)
+            self.unknown.append(word)
 
         print(f"\n✅ 第一關完成！")
         self.current_level = 2
@@ -267,22 +335,14 @@ class LanguageCreatorGame:
 
         # 將之前生成的詞語分類
         print("\n首先，讓我們為之前生成的詞語分類：")
-        for word in self.vocabulary['unknown'][:]:
+        word_classes = {'n': self.nouns, 'v': self.verbs, 'a': self.adjectives, 'd': self.adverbs}
+        for word in self.unknown:
             print(f"\n詞語：{word}")
             word_class = input("這個詞是 (n)名詞 (v)動詞 (a)形容詞 (d)副詞？ ").lower()
+            # 預設為名詞
+            word_classes.get(word_class, self.nouns).append(word)
 
-            if word_class == 'n':
-                self.vocabulary['noun'].append(word)
-            elif word_class == 'v':
-                self.vocabulary['verb'].append(word)
-            elif word_class == 'a':
-                self.vocabulary['adjective'].append(word)
-            elif word_class == 'd':
-                self.vocabulary['adverb'].append(word)
-            else:
-                self.vocabulary['noun'].append(word)  # 預設為名詞
-
-            self.vocabulary['unknown'].remove(word)
+        self.unknown = []
 
         # 添加構詞規則
         print("\n現在我們來創建構詞規則：")
@@ -342,15 +402,15 @@ class LanguageCreatorGame:
         print(f"\n🎨 讓我們用 {self.syntax.word_order} 語序生成一些句子：")
 
         # 確保各詞類都有詞語
-        if not self.vocabulary['noun']:
-            self.vocabulary['noun'].append(self.phonology.generate_word())
-        if not self.vocabulary['verb']:
-            self.vocabulary['verb'].append(self.phonology.generate_word())
+        if not self.nouns:
+            self.nouns.append(self.phonology.generate_word())
+        if not self.verbs:
+            self.verbs.append(self.phonology.generate_word())
 
         for i in range(3):
-            subject = random.choice(self.vocabulary['noun'])
-            verb = random.choice(self.vocabulary['verb'])
-            obj = random.choice(self.vocabulary['noun']) if len(self.vocabulary['noun']) > 1 else ""
+            subject = random.choice(self.nouns)
+            verb = random.choice(self.verbs)
+            obj = random.choice(self.nouns) if len(self.nouns) > 1 else ""
 
             sentence = self.syntax.generate_sentence(subject, verb, obj)
             print(f"{i+1}. {sentence}")
@@ -390,34 +450,36 @@ class LanguageCreatorGame:
         # ✅ 改進版：最終語言展示
         print(f"\n🌟 你的語言作品展示:")
 
+        choice = random.choice
+        rand = random.random
         for i in range(6):
-            if self.vocabulary['noun'] and self.vocabulary['verb']:
+            if self.nouns and self.verbs:
                 # === 1️⃣ 選取詞彙 ===
-                subject = random.choice(self.vocabulary['noun'])
-                verb = random.choice(self.vocabulary['verb'])
-                obj = random.choice(self.vocabulary['noun']) if len(self.vocabulary['noun']) > 1 else ""
+                subject = choice(self.nouns)
+                verb = choice(self.verbs)
+                obj = choice(self.nouns) if len(self.nouns) > 1 else ""
 
                 # === 2️⃣ 套用構詞規則 ===
                 # 名詞 → 複數
-                if random.random() < 0.3:  # 30% 機率複數化主語
+                if rand() < 0.3:  # 30% 機率複數化主語
                     subject = self.morphology.apply_morphology(subject, "plural")
-                if obj and random.random() < 0.3:
+                if obj and rand() < 0.3:
                     obj = self.morphology.apply_morphology(obj, "plural")
 
                 # 動詞 → 否定 / 不定式 / 時態變化（可視情況擴充）
-                if random.random() < 0.3:
+                if rand() < 0.3:
                     verb = self.morphology.apply_morphology(verb, "in_prefix")
-                elif random.random() < 0.3:
+                elif rand() < 0.3:
                     verb = self.morphology.apply_morphology(verb, "ar_suffix")
 
                 # 副詞 → -mente（如有形容詞可改 obj）
-                if self.vocabulary['adjective'] and random.random() < 0.3:
-                    adj = random.choice(self.vocabulary['adjective'])
+                if self.adjectives and rand() < 0.3:
+                    adj = choice(self.adjectives)
                     adv = self.morphology.apply_morphology(adj, "mente_suffix")
                     obj = f"{adv} {obj}"
 
                 # === 3️⃣ 生成句子 ===
-                if random.random() < 0.2:
+                if rand() < 0.2:
                     sentence = self.syntax.generate_yesno_question(subject, verb, obj)
                 else:
                     sentence = self.syntax.generate_sentence(subject, verb, obj)